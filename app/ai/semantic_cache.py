@@ -0,0 +1,74 @@
+import threading
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+_MODEL_NAME = "all-MiniLM-L6-v2"
+_EMBEDDING_DIM = 384
+# per-namespace cap; outputs hold whole summaries/quiz payloads, so an
+# unbounded index would grow with every distinct upload forever
+_MAX_ENTRIES = 512
+
+
+class SemanticCache:
+    # exact-hash caching misses slightly reworded inputs (re-uploads, edited docs);
+    # this catches near-duplicates by cosine similarity over sentence embeddings
+    def __init__(self, threshold: float = 0.95):
+        self.threshold = threshold
+        self._model: SentenceTransformer | None = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._indexes: dict[str, faiss.IndexFlatIP] = {}
+        self._outputs: dict[str, list] = {}
+        # kept so the index can be rebuilt after eviction; IndexFlat can't pop
+        self._vectors: dict[str, list[np.ndarray]] = {}
+
+    def _embed(self, text: str) -> np.ndarray:
+        with self._model_lock:
+            if self._model is None:
+                self._model = SentenceTransformer(_MODEL_NAME)
+            # normalized embeddings make inner product == cosine similarity
+            vector = self._model.encode([text], normalize_embeddings=True)
+        return np.asarray(vector, dtype="float32")
+
+    def get(self, namespace: str, text: str):
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None or index.ntotal == 0:
+                return None
+        vector = self._embed(text)
+        with self._lock:
+            # re-fetch after embedding: set() may have evicted and rebuilt the
+            # index while the lock was released, and ids from a stale index
+            # must never be applied to the current outputs list
+            index = self._indexes.get(namespace)
+            if index is None or index.ntotal == 0:
+                return None
+            similarities, ids = index.search(vector, 1)
+            if similarities[0][0] >= self.threshold:
+                return self._outputs[namespace][ids[0][0]]
+        return None
+
+    def set(self, namespace: str, text: str, output) -> None:
+        vector = self._embed(text)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = faiss.IndexFlatIP(_EMBEDDING_DIM)
+                self._indexes[namespace] = index
+                self._outputs[namespace] = []
+                self._vectors[namespace] = []
+            if index.ntotal >= _MAX_ENTRIES:
+                # drop the oldest half and rebuild the index from what's left
+                keep = _MAX_ENTRIES // 2
+                self._outputs[namespace] = self._outputs[namespace][-keep:]
+                self._vectors[namespace] = self._vectors[namespace][-keep:]
+                index = faiss.IndexFlatIP(_EMBEDDING_DIM)
+                index.add(np.vstack(self._vectors[namespace]))
+                self._indexes[namespace] = index
+            index.add(vector)
+            self._outputs[namespace].append(output)
+            self._vectors[namespace].append(vector)
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,736 @@
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+import fitz
+import httpx
+import json_repair
+import orjson
+import tiktoken
+from types import MappingProxyType
+from cachetools import TTLCache
+from fastapi import HTTPException, status
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI, RateLimitError
+from openai.types.chat import ChatCompletion
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from docx import Document
+from PIL import Image
+from tesserocr import PSM, PyTessBaseAPI
+from app.core.config import settings
+from app.ai.semantic_cache import semantic_cache
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+# keep each tesseract instance single-threaded; we parallelize across pages ourselves
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# 150 DPI grayscale is plenty for typical scanned text and a fraction of the
+# pixel bandwidth of 300 DPI RGB
+_OCR_MATRIX = fitz.Matrix(150 / 72, 150 / 72)
+
+# encoder is expensive to build, so load it once at import time
+try:
+    _ENC = tiktoken.encoding_for_model(settings.AI_MODEL.split("/")[-1])
+except KeyError:
+    _ENC = tiktoken.get_encoding("cl100k_base")
+
+# leave headroom for the completion inside the model's context window
+_MAX_INPUT_TOKENS = settings.AI_MODEL_CONTEXT_TOKENS - 4096
+
+
+# token counts for the same document are requested repeatedly (summary, quiz
+# and flashcards all gate on the same text), so memoize them by content hash.
+# both memo caches are touched from the event loop and from to_thread workers,
+# and cachetools caches aren't thread-safe, so mutations go through one lock
+_token_count_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+_token_cache_lock = threading.Lock()
+
+
+def _count_tokens(text: str) -> int:
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _token_cache_lock:
+        cached = _token_count_cache.get(key)
+    if cached is None:
+        cached = len(_ENC.encode(text))
+        with _token_cache_lock:
+            _token_count_cache[key] = cached
+    return cached
+
+
+# truncation of a large document is re-requested by every generator that
+# touches it, so memoize the result by content hash
+_truncate_cache: TTLCache = TTLCache(maxsize=128, ttl=3600)
+
+
+# no tokenizer maps fewer than one token per ~6 chars of real text, so anything
+# past limit * 6 chars can't survive truncation anyway; slicing first keeps the
+# tokenizer from chewing through multi-megabyte uploads just to discard them
+_MAX_CHARS_PER_TOKEN = 6
+
+
+def _truncate_to_tokens(text: str, limit: int) -> str:
+    if len(text) > limit * _MAX_CHARS_PER_TOKEN:
+        text = text[:limit * _MAX_CHARS_PER_TOKEN]
+    if _count_tokens(text) <= limit:
+        return text
+    key = (hashlib.blake2b(text.encode(), digest_size=16).digest(), limit)
+    with _token_cache_lock:
+        cached = _truncate_cache.get(key)
+    if cached is None:
+        cached = _ENC.decode(_ENC.encode(text)[:limit])
+        # back off to the last paragraph (or failing that, sentence) boundary
+        # so the model's final context isn't half a sentence
+        boundary = cached.rfind("\n\n")
+        if boundary < len(cached) // 2:
+            boundary = cached.rfind(". ")
+        if boundary > len(cached) // 2:
+            cached = cached[:boundary + 1]
+        with _token_cache_lock:
+            _truncate_cache[key] = cached
+    return cached
+
+
+_MAP_CHUNK_TOKENS = 20_000
+
+
+def _split_by_tokens(text: str, limit: int) -> list[str]:
+    # pack paragraphs into chunks up to the token budget, hard-splitting only
+    # when a single paragraph is itself oversized
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for paragraph in text.split("\n\n"):
+        paragraph_tokens = _count_tokens(paragraph) + 2
+        if current and current_tokens + paragraph_tokens > limit:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if paragraph_tokens > limit:
+            ids = _ENC.encode(paragraph)
+            for start in range(0, len(ids), limit):
+                chunks.append(_ENC.decode(ids[start:start + limit]))
+            continue
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.MULTILINE)
+
+
+def _parse_json_content(content: str):
+    content = _FENCE_RE.sub("", content)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # models occasionally emit trailing commas or similar near-misses;
+        # repairing locally is far cheaper than regenerating thousands of tokens
+        return json_repair.loads(content)
+
+
+# static prompt tables, hoisted so the hot path doesn't rebuild them per call
+_MODELS_WITHOUT_SYSTEM = ("gemma", "gemma-2")
+
+_SUMMARY_PROMPTS = MappingProxyType({
+    "general": "Summarize the following study material, keeping the key ideas, definitions and examples:",
+    "brief": "Summarize the following study material in a few short paragraphs:",
+    "detailed": "Write a detailed, well-structured summary of the following study material with section headings:",
+})
+
+_QUIZ_TYPE_INSTRUCTIONS = MappingProxyType({
+    "multiple_choice": "Each question must have exactly 4 options and one correct answer.",
+    "true_false": "Each question must be answerable with True or False.",
+    "short_answer": "Each question must have a short free-text answer.",
+})
+
+# static user-prompt prefixes: providers cache on identical leading tokens, so
+# the constant instruction/schema text goes first and the variable parts last
+_QUIZ_USER_PREFIX = (
+    "Create quiz questions from the material below. "
+    'Respond as {"questions": [{"question": "...", "options": ["..."], "answer": "...", "explanation": "..."}]}'
+)
+_FLASHCARD_USER_PREFIX = (
+    "Create flashcards from the material below. "
+    'Respond as {"flashcards": [{"front": "...", "back": "...", "difficulty": "easy|medium|hard"}]}'
+)
+
+_SUMMARY_SYSTEM = "You are an academic assistant that summarizes study material for students."
+_QUIZ_SYSTEM = "You are an academic assistant that writes quizzes. Respond with JSON only."
+_FLASHCARD_SYSTEM = "You are an academic assistant that writes flashcards. Respond with JSON only."
+_STUDY_PACK_SYSTEM = "You are an academic assistant that builds study packs. Respond with JSON only."
+_ORIENTATION_SYSTEM = "You are a friendly study coach welcoming a new student to the platform."
+_EXPLAIN_SYSTEM = "You are an academic assistant that explains concepts in plain language."
+_CLEANUP_SYSTEM = "You clean up raw text extracted from documents. Return only the cleaned text."
+_VISION_OCR_PROMPT = "Transcribe all of the text in this document page. Return only the transcribed text."
+
+# one frozen sampling config per operation, built once instead of per call
+_OP_CONFIG = MappingProxyType({
+    "summary": MappingProxyType({"temperature": 0.7, "max_tokens": 2000}),
+    "quiz": MappingProxyType({"temperature": 0.7, "max_tokens": 4000}),
+    "flashcards": MappingProxyType({"temperature": 0.7, "max_tokens": 4000}),
+    "study_pack": MappingProxyType({"temperature": 0.7, "max_tokens": 8000}),
+    "orientation": MappingProxyType({"temperature": 0.9, "max_tokens": 500}),
+    "explain": MappingProxyType({"temperature": 0.7, "max_tokens": 1500}),
+    "cleanup": MappingProxyType({"temperature": 0.3, "max_tokens": 4000}),
+    "vision_ocr": MappingProxyType({"temperature": 0.1, "max_tokens": 4000}),
+})
+
+
+@dataclass(slots=True)
+class BatchJob:
+    operation: str
+    system_content: str
+    user_content: str
+
+
+class AIService:
+    def __init__(self):
+        # one pooled HTTP/2 client for every request; keep-alive skips the TCP/TLS setup per call
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=600),
+        )
+        self.client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=settings.OPENROUTER_API_KEY, http_client=self._http)
+        self.model = settings.AI_MODEL
+        # OpenRouter doesn't implement the Files/Batches endpoints, so batch
+        # traffic goes straight to OpenAI when a key is configured
+        self._batch_client = (
+            AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=self._http)
+            if settings.OPENAI_API_KEY else None
+        )
+        # the model never changes after init, so detect system-role support once here
+        self._combine_system = any(m in self.model.lower() for m in _MODELS_WITHOUT_SYSTEM)
+        # identical concurrent requests share a single in-flight API call
+        self._inflight: dict[str, asyncio.Future] = {}
+        # exact-match response cache; repeat prompts skip the provider entirely
+        self._response_cache: TTLCache = TTLCache(maxsize=10_000, ttl=86_400)
+        self._disk_cache = diskcache.Cache(settings.AI_RESPONSE_CACHE_DIR, size_limit=512 * 2**20)
+        # remember failures briefly so user retries of a bad input don't burn
+        # quota re-triggering the same provider error every few seconds
+        self._failure_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+        self._cache_lock = threading.Lock()
+        self._sweeper: asyncio.Task | None = None
+        # batch_id -> {custom_id: interactive cache key}, so fetched batch
+        # results can be mapped back to jobs and seeded into the response cache
+        self._batch_keys: dict[str, dict[str, str]] = {}
+        # recent completion lengths per operation, for adaptive max_tokens
+        self._output_tokens: defaultdict[str, deque] = defaultdict(lambda: deque(maxlen=100))
+        # persistent libtesseract handle per worker thread, built lazily
+        self._tess_local = threading.local()
+        # long-lived OCR pool: worker threads survive across documents so their
+        # thread-local tesseract instances really do load the language model once
+        self._ocr_workers = os.cpu_count() or 1
+        self._ocr_executor = ThreadPoolExecutor(max_workers=self._ocr_workers, thread_name_prefix="ocr")
+        self._tess_apis: list[PyTessBaseAPI] = []
+        self._tess_lock = threading.Lock()
+
+    def start_maintenance(self):
+        # TTLCache only evicts lazily when touched, so entries that expire and
+        # are never probed again sit in memory; sweep them off the hot path
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_expired())
+
+    async def _sweep_expired(self):
+        while True:
+            await asyncio.sleep(60)
+            with self._cache_lock:
+                self._response_cache.expire()
+                self._failure_cache.expire()
+            await asyncio.to_thread(self._disk_cache.expire)
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self._http.aclose()
+        self._disk_cache.close()
+        # drain the OCR threads before tearing down their tesseract handles
+        self._ocr_executor.shutdown(wait=True)
+        with self._tess_lock:
+            for api in self._tess_apis:
+                api.End()
+            self._tess_apis.clear()
+
+    def _get_tess_api(self) -> PyTessBaseAPI:
+        # constructing the API loads the language model from disk (~500ms), so
+        # each worker thread keeps one instance alive for the life of the service
+        api = getattr(self._tess_local, "api", None)
+        if api is None:
+            api = PyTessBaseAPI(lang="eng", psm=PSM.AUTO)
+            self._tess_local.api = api
+            with self._tess_lock:
+                self._tess_apis.append(api)
+        return api
+
+    def _ocr_page_gated(self, rendered: tuple[int, int, bytes], gate: threading.Semaphore) -> str:
+        try:
+            return self._ocr_page(rendered)
+        finally:
+            gate.release()
+
+    def _ocr_page(self, rendered: tuple[int, int, bytes]) -> str:
+        width, height, samples = rendered
+        api = self._get_tess_api()
+        # frombuffer wraps the pixmap's sample buffer without copying it
+        api.SetImage(Image.frombuffer("L", (width, height), samples, "raw", "L", 0, 1))
+        return api.GetUTF8Text()
+
+    @retry(retry=retry_if_exception(_is_transient), stop=stop_after_attempt(3),
+           wait=wait_exponential(multiplier=0.5, max=8), reraise=True)
+    async def _create_with_retry(self, **kwargs):
+        return await self.client.chat.completions.create(**kwargs)
+
+    @staticmethod
+    def _cache_key(op: str, kwargs: dict) -> str:
+        # full-payload digest: hashing even a 100 KB prompt costs microseconds
+        # against a multi-second LLM call, and a key collision here would hand
+        # the caller another prompt's completion. max_tokens is excluded so
+        # adaptive-budget drift doesn't make identical prompts miss the cache.
+        keyed = {k: v for k, v in kwargs.items() if k != "max_tokens"}
+        return hashlib.blake2b(op.encode() + b"|" + orjson.dumps(keyed, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+    async def _coalesced_create(self, op: str, **kwargs):
+        key = self._cache_key(op, kwargs)
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+            failure = self._failure_cache.get(key)
+        if cached is not None:
+            return cached
+        if failure is not None:
+            raise failure
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await pending
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # L2: disk-backed and shared across workers and restarts, so one
+            # worker's generation serves the whole deployment
+            response = await asyncio.to_thread(self._disk_cache.get, key)
+            if response is None:
+                response = await self._create_with_retry(**kwargs)
+                # record completion length for fresh provider calls only; cache
+                # hits would re-count the same completion and skew the p95
+                usage = getattr(response, "usage", None)
+                if usage is not None and usage.completion_tokens:
+                    self._output_tokens[op].append(usage.completion_tokens)
+                await asyncio.to_thread(self._disk_cache.set, key, response, expire=86_400)
+            with self._cache_lock:
+                self._response_cache[key] = response
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            if isinstance(e, Exception):
+                with self._cache_lock:
+                    self._failure_cache[key] = e
+            future.set_exception(e)
+            future.exception()  # mark retrieved in case nobody else joined
+            raise
+        finally:
+            del self._inflight[key]
+
+    def clear_negative_cache(self):
+        with self._cache_lock:
+            self._failure_cache.clear()
+
+    def _adaptive_max_tokens(self, op: str, fallback: int) -> int:
+        # asking for a 4000-token budget when the op's p95 output is 900 makes
+        # providers reserve decode capacity we never use; once there's enough
+        # history, request p95 * 1.2 instead (capped at the configured budget)
+        history = self._output_tokens[op]
+        if len(history) < 20:
+            return fallback
+        p95 = sorted(history)[int(len(history) * 0.95)]
+        return min(max(int(p95 * 1.2), 256), fallback)
+
+    def _create_messages(self, system_content: str, user_content: str):
+        # some open models don't accept a system role, so fold it into the user turn for those
+        if self._combine_system:
+            return [{"role": "user", "content": f"{system_content}\n\n{user_content}"}]
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content},
+        ]
+
+    async def _chat(self, system_content: str, user_content: str, *, op: str,
+                    response_format: dict | None = None) -> str:
+        kwargs = {
+            "model": self.model,
+            "messages": self._create_messages(system_content, user_content),
+            **_OP_CONFIG[op],
+        }
+        kwargs["max_tokens"] = self._adaptive_max_tokens(op, kwargs["max_tokens"])
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        try:
+            response = await self._coalesced_create(op, **kwargs)
+            return response.choices[0].message.content or ""
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI {op} request failed: {e}")
+
+    async def _chat_json(self, system_content: str, user_content: str, *, op: str, result_key: str) -> list:
+        content = await self._chat(
+            system_content, user_content, op=op,
+            response_format={"type": "json_object"},
+        )
+        try:
+            parsed = _parse_json_content(content)
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI {op} response was not valid JSON: {e}")
+        if isinstance(parsed, dict):
+            return parsed.get(result_key, [])
+        return parsed if isinstance(parsed, list) else []
+
+    async def generate_summary(self, text: str, summary_type: str = "general") -> str:
+        # don't spend an API round-trip on text too short to summarize
+        if not text or len(text.strip()) < 50:
+            return ""
+        if _count_tokens(text) > _MAX_INPUT_TOKENS:
+            return await self._summarize_map_reduce(text, summary_type)
+        cache_ns = f"summary|{summary_type}"
+        cached = await asyncio.to_thread(semantic_cache.get, cache_ns, text)
+        if cached is not None:
+            return cached
+        user_content = f"{_SUMMARY_PROMPTS.get(summary_type, _SUMMARY_PROMPTS['general'])}\n\n{text}"
+        summary = await self._chat(_SUMMARY_SYSTEM, user_content, op="summary")
+        await asyncio.to_thread(semantic_cache.set, cache_ns, text, summary)
+        return summary
+
+    async def _summarize_map_reduce(self, text: str, summary_type: str) -> str:
+        # summarize chunks in parallel, then summarize the summaries; wall time
+        # is roughly one chunk latency plus the reduce call instead of N in a row
+        chunks = await asyncio.to_thread(_split_by_tokens, text, _MAP_CHUNK_TOKENS)
+        semaphore = asyncio.Semaphore(10)
+
+        async def summarize_chunk(chunk: str) -> str:
+            async with semaphore:
+                return await self._chat(_SUMMARY_SYSTEM, f"{_SUMMARY_PROMPTS['general']}\n\n{chunk}", op="summary")
+
+        partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        combined = "\n\n".join(partials)
+        user_content = f"{_SUMMARY_PROMPTS.get(summary_type, _SUMMARY_PROMPTS['general'])}\n\n{combined}"
+        return await self._chat(_SUMMARY_SYSTEM, user_content, op="summary")
+
+    async def generate_summaries(self, texts: list[str], summary_type: str = "general") -> list[str]:
+        # multi-document batches should pay roughly one round-trip, not N; the
+        # semaphore keeps the fan-out friendly to provider rate limits
+        semaphore = asyncio.Semaphore(10)
+
+        async def summarize(text: str) -> str:
+            async with semaphore:
+                return await self.generate_summary(text, summary_type)
+
+        return list(await asyncio.gather(*(summarize(text) for text in texts)))
+
+    async def generate_summary_stream(self, text: str, summary_type: str = "general"):
+        # streaming variant for routes that want tokens on the wire as they
+        # arrive; first output reaches the client in ~300ms instead of after
+        # the whole completion, and the assembled summary still gets cached
+        if not text or len(text.strip()) < 50:
+            return
+        text = _truncate_to_tokens(text, _MAX_INPUT_TOKENS)
+        cache_ns = f"summary|{summary_type}"
+        cached = await asyncio.to_thread(semantic_cache.get, cache_ns, text)
+        if cached is not None:
+            yield cached
+            return
+        user_content = f"{_SUMMARY_PROMPTS.get(summary_type, _SUMMARY_PROMPTS['general'])}\n\n{text}"
+        parts: list[str] = []
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._create_messages(_SUMMARY_SYSTEM, user_content),
+                stream=True,
+                **_OP_CONFIG["summary"],
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI summary request failed: {e}")
+        summary = "".join(parts)
+        if summary:
+            await asyncio.to_thread(semantic_cache.set, cache_ns, text, summary)
+
+    async def generate_quiz_questions(self, text: str, num_questions: int = 10, quiz_type: str = "multiple_choice") -> list:
+        if not text or len(text.strip()) < 50:
+            return []
+        num_questions = max(1, min(num_questions, 50))
+        text = _truncate_to_tokens(text, _MAX_INPUT_TOKENS)
+        cache_ns = f"quiz|{quiz_type}|{num_questions}"
+        cached = await asyncio.to_thread(semantic_cache.get, cache_ns, text)
+        if cached is not None:
+            return cached
+        user_content = (
+            f"{_QUIZ_USER_PREFIX}\n"
+            f"{_QUIZ_TYPE_INSTRUCTIONS.get(quiz_type, _QUIZ_TYPE_INSTRUCTIONS['multiple_choice'])}\n"
+            f"Number of questions: {num_questions}\n\n{text}"
+        )
+        questions = await self._chat_json(_QUIZ_SYSTEM, user_content, op="quiz", result_key="questions")
+        await asyncio.to_thread(semantic_cache.set, cache_ns, text, questions)
+        return questions
+
+    async def generate_flashcards(self, text: str, num_cards: int = 20) -> list:
+        if not text or len(text.strip()) < 50:
+            return []
+        num_cards = max(1, min(num_cards, 50))
+        text = _truncate_to_tokens(text, _MAX_INPUT_TOKENS)
+        cache_ns = f"flashcards|{num_cards}"
+        cached = await asyncio.to_thread(semantic_cache.get, cache_ns, text)
+        if cached is not None:
+            return cached
+        user_content = f"{_FLASHCARD_USER_PREFIX}\nNumber of cards: {num_cards}\n\n{text}"
+        cards = await self._chat_json(_FLASHCARD_SYSTEM, user_content, op="flashcards", result_key="flashcards")
+        await asyncio.to_thread(semantic_cache.set, cache_ns, text, cards)
+        return cards
+
+    async def submit_batch(self, jobs: list[BatchJob]) -> dict:
+        # non-urgent work (bulk regeneration, nightly jobs) goes through the
+        # provider batch endpoint: ~half the per-token price and it doesn't
+        # compete with interactive traffic for rate limit
+        if self._batch_client is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Batch API not configured: set OPENAI_API_KEY")
+        lines = []
+        custom_ids: list[str] = []
+        job_keys: dict[str, str] = {}
+        for job in jobs:
+            op = job.operation if job.operation in _OP_CONFIG else "summary"
+            messages = self._create_messages(job.system_content, job.user_content)
+            body = {
+                # OpenAI wants the bare model name, not the OpenRouter vendor/model form
+                "model": self.model.split("/")[-1],
+                "messages": messages,
+                **_OP_CONFIG[op],
+            }
+            custom_id = hashlib.blake2b(orjson.dumps(body, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+            custom_ids.append(custom_id)
+            # the key the interactive path would use for this same prompt, so
+            # fetched results can serve later _chat calls from the cache
+            job_keys[custom_id] = self._cache_key(op, {"model": self.model, "messages": messages, **_OP_CONFIG[op]})
+            lines.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }))
+        batch_file = await self._batch_client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await self._batch_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        self._batch_keys[batch.id] = job_keys
+        # custom_ids is aligned with jobs so callers can map results back
+        return {"batch_id": batch.id, "custom_ids": custom_ids}
+
+    async def fetch_batch(self, batch_id: str) -> dict:
+        if self._batch_client is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Batch API not configured: set OPENAI_API_KEY")
+        batch = await self._batch_client.batches.retrieve(batch_id)
+        results: dict[str, str] = {}
+        if batch.status == "completed" and batch.output_file_id:
+            job_keys = self._batch_keys.pop(batch_id, {})
+            output = await self._batch_client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                row = orjson.loads(line)
+                body = (row.get("response") or {}).get("body") or {}
+                choices = body.get("choices") or []
+                if not choices:
+                    continue
+                results[row["custom_id"]] = choices[0]["message"]["content"]
+                key = job_keys.get(row["custom_id"])
+                if key is not None:
+                    # seed the interactive caches so a later identical _chat
+                    # call is a hit instead of a fresh real-time request
+                    response = ChatCompletion.model_validate(body)
+                    with self._cache_lock:
+                        self._response_cache[key] = response
+                    await asyncio.to_thread(self._disk_cache.set, key, response, expire=86_400)
+        return {"status": batch.status, "results": results}
+
+    async def generate_flashcards_batch(self, texts: list[str], num_cards: int = 20) -> list[list]:
+        # one concurrent call per document instead of cramming every text into
+        # a single oversized prompt; same fan-out shape as generate_summaries
+        semaphore = asyncio.Semaphore(10)
+
+        async def cards_for(text: str) -> list:
+            async with semaphore:
+                return await self.generate_flashcards(text, num_cards)
+
+        return list(await asyncio.gather(*(cards_for(text) for text in texts)))
+
+    async def generate_study_pack(self, text: str, num_questions: int = 10, num_cards: int = 20) -> dict:
+        # the document text dominates input cost; building summary, quiz and
+        # flashcards in one call sends and tokenizes it once instead of three times
+        if not text or len(text.strip()) < 50:
+            return {"summary": "", "questions": [], "flashcards": []}
+        num_questions = max(1, min(num_questions, 50))
+        num_cards = max(1, min(num_cards, 50))
+        text = _truncate_to_tokens(text, _MAX_INPUT_TOKENS)
+        user_content = (
+            f"From the material below, produce a summary, {num_questions} multiple_choice questions "
+            f"(4 options and one correct answer each) and {num_cards} flashcards. "
+            'Respond as {"summary": "...", "questions": [{"question": "...", "options": ["..."], '
+            '"answer": "...", "explanation": "..."}], "flashcards": [{"front": "...", "back": "...", '
+            '"difficulty": "easy|medium|hard"}]}'
+            f"\n\n{text}"
+        )
+        content = await self._chat(
+            _STUDY_PACK_SYSTEM, user_content, op="study_pack",
+            response_format={"type": "json_object"},
+        )
+        try:
+            parsed = _parse_json_content(content)
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI study_pack response was not valid JSON: {e}")
+        if not isinstance(parsed, dict):
+            return {"summary": "", "questions": [], "flashcards": []}
+        pack = {
+            "summary": parsed.get("summary", ""),
+            "questions": parsed.get("questions", []),
+            "flashcards": parsed.get("flashcards", []),
+        }
+        # seed the per-product caches so a later generate_summary/quiz/flashcards
+        # call on the same material hits without another round-trip
+        if pack["summary"]:
+            await asyncio.to_thread(semantic_cache.set, "summary|general", text, pack["summary"])
+        if pack["questions"]:
+            await asyncio.to_thread(semantic_cache.set, f"quiz|multiple_choice|{num_questions}", text, pack["questions"])
+        if pack["flashcards"]:
+            await asyncio.to_thread(semantic_cache.set, f"flashcards|{num_cards}", text, pack["flashcards"])
+        return pack
+
+    async def generate_orientation_message(self, academic_level: str) -> str:
+        user_content = (
+            f"Write a short welcome message for a new {academic_level} student, "
+            "with two or three tips on how to get the most out of their study material."
+        )
+        return await self._chat(_ORIENTATION_SYSTEM, user_content, op="orientation")
+
+    async def explain_concept(self, concept: str, text: str) -> str:
+        text = _truncate_to_tokens(text, _MAX_INPUT_TOKENS)
+        user_content = f"Using the material below, explain the concept '{concept}' to a student:\n\n{text}"
+        return await self._chat(_EXPLAIN_SYSTEM, user_content, op="explain")
+
+    async def ocr_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
+        encoded = base64.b64encode(image_bytes).decode("ascii")
+        messages = [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": _VISION_OCR_PROMPT},
+                {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded}"}},
+            ],
+        }]
+        try:
+            response = await self._coalesced_create("vision_ocr", model=self.model, messages=messages, **_OP_CONFIG["vision_ocr"])
+            return response.choices[0].message.content or ""
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI vision_ocr request failed: {e}")
+
+    def _extract_raw(self, file_path: str, file_type: str) -> tuple[str, bool]:
+        raw_parts: list[str] = []
+        used_ocr = False
+        if file_type == "pdf":
+            with fitz.open(file_path) as doc:
+                sample_pages = min(5, len(doc))
+                native_chars = 0
+                assume_scanned = False
+                # OCR starts while later pages are still rendering; the semaphore
+                # bounds rendered-but-unprocessed rasters so a big scan can't pile
+                # every page up in RAM ahead of the workers
+                render_gate = threading.Semaphore(self._ocr_workers * 2)
+                ocr_futures: list[tuple[int, object]] = []
+                for index, page in enumerate(doc):
+                    if index == sample_pages and native_chars < 100:
+                        # the sampled pages yielded next to no native text: this is a
+                        # scan, so stop probing text layers and render the rest for OCR
+                        assume_scanned = True
+                    text = "" if assume_scanned else page.get_text("text")
+                    raw_parts.append(text)
+                    stripped = text.strip()
+                    native_chars += len(stripped)
+                    if not stripped:
+                        # no text layer on this page; render it for OCR straight to raw
+                        # grayscale pixels, skipping the PNG encode/decode round trip
+                        render_gate.acquire()
+                        pix = page.get_pixmap(matrix=_OCR_MATRIX, colorspace=fitz.csGRAY)
+                        rendered = (pix.width, pix.height, pix.samples)
+                        ocr_futures.append((index, self._ocr_executor.submit(self._ocr_page_gated, rendered, render_gate)))
+                for index, future in ocr_futures:
+                    raw_parts[index] = future.result()
+            if ocr_futures:
+                used_ocr = True
+        elif file_type == "docx":
+            try:
+                document = Document(file_path)
+            except Exception as e:
+                # python-docx only reads the zip-based .docx format; legacy
+                # binary .doc (or a corrupt archive) must fail as a client
+                # error so the failure cache applies, not an unhandled 500
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Could not parse Word document: {e}",
+                )
+            for paragraph in document.paragraphs:
+                raw_parts.append(paragraph.text)
+            for table in document.tables:
+                for row in table.rows:
+                    cells = [cell.text.strip() for cell in row.cells]
+                    cells = [cell for cell in cells if cell]
+                    if cells:
+                        raw_parts.append(" | ".join(cells))
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported file type: {file_type}")
+        return "\n".join(raw_parts), used_ocr
+
+    @staticmethod
+    def _extraction_quality_ok(text: str) -> bool:
+        if not text or "\x00" in text:
+            return False
+        # stay in C for every stat: the encode drops non-ASCII in one pass,
+        # instead of a per-character Python loop over megabytes of OCR output
+        non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+        if non_ascii / len(text) >= 0.05:
+            return False
+        words = text.split()
+        if not words:
+            return False
+        avg_word_len = sum(map(len, words)) / len(words)
+        return 3 <= avg_word_len <= 12
+
+    async def extract_text_from_document(self, file_path: str, file_type: str, force_ai_cleanup: bool = False) -> str:
+        # parsing is CPU-bound and can take seconds on big documents; keep it off the event loop
+        raw_text, used_ocr = await asyncio.to_thread(self._extract_raw, file_path, file_type)
+
+        # native text layers and DOCX bodies come out clean; the AI cleanup pass is
+        # only worth paying for when OCR actually ran and its output looks rough
+        if not force_ai_cleanup and (not used_ocr or self._extraction_quality_ok(raw_text)):
+            return raw_text.strip()
+
+        # second pass: have the model clean up extraction artifacts (broken lines, headers, page numbers)
+        user_content = f"Clean up the following extracted text, fixing broken lines and removing artifacts:\n\n{_truncate_to_tokens(raw_text, 3000)}"
+        cleaned = await self._chat(_CLEANUP_SYSTEM, user_content, op="cleanup")
+        return cleaned or raw_text
+
+
+ai_service = AIService()
@@ -5,6 +5,7 @@ from app.core.config import settings
 from sqlmodel import Session, select, or_
 from . import models
 from datetime import datetime, timedelta, timezone
+import logging
 import jwt
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated
@@ -14,6 +15,7 @@ from app.core.dependencies import get_session
 hasher = PasswordHash(hashers=[argon2.Argon2Hasher()])
 oauth2_scheme = OAuth2PasswordBearer("/auth/token")
 JWT_ALGORITHM = "HS256"
+logger = logging.getLogger(__name__)
 
 def encrypt_password(password: str):
     return hasher.hash(password, salt=settings.HASH_SALT)
@@ -27,7 +29,7 @@ def get_user(username: str, session: Session):
 
 def authenticate_user(session: Session, username: str, password: str):
     user = get_user(username, session)
-    print(user)
+    logger.debug("authenticating user: %s", user)
     if not user:
         return False
     if not verify_password(password, user.hashed_password):
@@ -41,7 +43,7 @@ def create_auth_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(hours=1)
     to_encode.update({"exp": expire})
-    print("ENCODING: ", to_encode)
+    logger.debug("encoding auth token claims: %s", to_encode)
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
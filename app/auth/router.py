@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Annotated
 from fastapi.security import OAuth2PasswordRequestForm
@@ -7,6 +8,8 @@ from .dependencies import encrypt_password, authenticate_user, create_auth_token
 from sqlmodel import Session, select
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/auth")
 ACCESS_TOKEN_EXPIRY_MINUTES = 60
 REFRESH_TOKEN_EXPIRY_MINUTES = 720
@@ -35,5 +38,5 @@ async def login_user(login_form: Annotated[OAuth2PasswordRequestForm, Depends()]
 
 @router.get("/me", response_model=models.Profile)
 async def get_user(current_user: CurrentActiveUser):
-    print(current_user)
+    logger.debug("current user: %s", current_user)
     return current_user.profile
\ No newline at end of file
@@ -8,6 +8,13 @@ class Settings(BaseSettings):
     DB_USER: str | None = None
     HASH_SALT: bytes | None = None
     SECRET_KEY: str = ""
+    OPENROUTER_API_KEY: str = ""
+    OPENAI_API_KEY: str = ""
+    AI_MODEL: str = "openai/gpt-4o-mini"
+    AI_MODEL_CONTEXT_TOKENS: int = 128000
+    UPLOAD_DIR: str = "uploads"
+    TEXT_CACHE_DIR: str = "cache/extracted_text"
+    AI_RESPONSE_CACHE_DIR: str = "cache/ai_responses"
 
     model_config = SettingsConfigDict(env_file=".env")
 
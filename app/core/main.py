@@ -2,16 +2,22 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.openapi.docs import get_redoc_html
 from app.core.database import create_tables
+from app import models  # load every table module so create_tables sees the full metadata
 from app.auth import router
+from app.courses import router as courses_router
+from app.ai.service import ai_service
 import uvicorn
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_tables()
+    ai_service.start_maintenance()
     yield
+    await ai_service.close()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(router.router)
+app.include_router(courses_router.router)
 
 if __name__ == "__main__":
     uvicorn.run("app.core.main:app", reload=True)
\ No newline at end of file
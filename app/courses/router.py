@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, UploadFile
+from app.files.service import file_service
 
 router = APIRouter()
 
 @router.post("/uploads/material")
-async def upload_material():
-    pass
\ No newline at end of file
+async def upload_material(file: UploadFile):
+    file_path = await file_service.save_upload(file)
+    text = await file_service.extract_text(file_path)
+    return {"filename": file.filename, "path": file_path, "text": text}
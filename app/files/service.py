@@ -0,0 +1,194 @@
+import asyncio
+import base64
+import codecs
+import hashlib
+import io
+import mmap
+import os
+import time
+import uuid
+import fitz
+import diskcache
+from cachetools import LRUCache
+
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image
+from app.core.config import settings
+from app.ai.service import ai_service
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+# 150 DPI grayscale render for the vision fallback; pages get thumbnailed to
+# 1024px and JPEG-compressed before upload since the provider downsamples
+# anything bigger server-side anyway
+_VISION_MATRIX = fitz.Matrix(150 / 72, 150 / 72)
+# how long a failed extraction stays cached before we let the ladder retry:
+# a day for genuinely unreadable documents, but only a minute for provider
+# errors so one upstream blip can't poison a file across workers
+_FAILURE_TTL = 24 * 3600
+_TRANSIENT_FAILURE_TTL = 60
+
+
+class FileProcessingService:
+    def __init__(self, upload_dir: str | None = None):
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        os.makedirs(self.upload_dir, exist_ok=True)
+        # extracted text keyed by content hash, so re-uploads skip the whole pipeline;
+        # disk-backed and size-bounded so every ASGI worker shares one store, with a
+        # small in-process layer in front to skip disk on hot entries
+        self._text_cache = diskcache.Cache(settings.TEXT_CACHE_DIR, size_limit=2 << 30)
+        self._memory_cache: LRUCache = LRUCache(maxsize=64)
+
+    async def save_upload(self, file: UploadFile) -> str:
+        # copy in fixed-size chunks; a large scanned PDF must never be buffered
+        # in memory whole
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        file_path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}{extension}")
+        with open(file_path, "wb") as out:
+            while chunk := await file.read(_COPY_CHUNK_SIZE):
+                out.write(chunk)
+        return file_path
+
+    @staticmethod
+    def _get_file_hash(file_path: str) -> str:
+        # sha256 gets SHA-NI/ARMv8 hardware rounds; md5 is scalar-only. Feeding
+        # an mmap to update() lets the kernel serve pages straight to OpenSSL,
+        # skipping the per-chunk read() syscalls and bounce-buffer copies.
+        if os.path.getsize(file_path) == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with open(file_path, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = hashlib.sha256()
+                digest.update(mm)
+                return digest.hexdigest()
+
+    async def extract_text(self, file_path: str) -> str:
+        file_hash = await asyncio.to_thread(self._get_file_hash, file_path)
+        entry = self._memory_cache.get(file_hash)
+        if entry is None:
+            entry = await asyncio.to_thread(self._text_cache.get, file_hash)
+            if entry is not None:
+                self._memory_cache[file_hash] = entry
+        if entry is not None:
+            entry_status, payload, expires_at = entry
+            if entry_status == "ok":
+                return payload
+            if time.time() < expires_at:
+                # same bad scan re-uploaded; don't re-run the 30-90s OCR ladder
+                raise HTTPException(status_code=payload[0], detail=payload[1])
+            # failure entry expired, let the ladder try again
+        file_type = os.path.splitext(file_path)[1].lstrip(".").lower()
+        handler = self._HANDLERS.get(file_type)
+        if handler is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported file type: {file_type}")
+        try:
+            text = await handler(self, file_path)
+        except HTTPException as e:
+            ttl = _TRANSIENT_FAILURE_TTL if e.status_code >= 500 else _FAILURE_TTL
+            entry = ("failed", (e.status_code, e.detail), time.time() + ttl)
+            self._memory_cache[file_hash] = entry
+            await asyncio.to_thread(self._text_cache.set, file_hash, entry, expire=ttl)
+            raise
+        entry = ("ok", text, 0.0)
+        self._memory_cache[file_hash] = entry
+        await asyncio.to_thread(self._text_cache.set, file_hash, entry)
+        return text
+
+    async def _handle_txt(self, file_path: str) -> str:
+        # plain text never leaves the process
+        return await asyncio.to_thread(self._extract_txt, file_path)
+
+    async def _handle_pdf(self, file_path: str) -> str:
+        text = await ai_service.extract_text_from_document(file_path, "pdf")
+        if len(text.strip()) < 50:
+            # local parse and OCR both came back empty; vision OCR is the last rung
+            text = await self._extract_pdf_with_ai_vision(file_path)
+        if len(text.strip()) < 50:
+            # the whole ladder struck out — surface it (and let extract_text cache
+            # the failure) instead of storing near-empty text as a success forever
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Could not extract readable text from document",
+            )
+        return text
+
+    async def _handle_docx(self, file_path: str) -> str:
+        return await ai_service.extract_text_from_document(file_path, "docx")
+
+    # extension -> extraction ladder; dict lookup instead of re-walking an
+    # if/elif chain of string compares on every call
+    _HANDLERS = {
+        "txt": _handle_txt,
+        "pdf": _handle_pdf,
+        "doc": _handle_docx,
+        "docx": _handle_docx,
+    }
+
+    @staticmethod
+    def _render_vision_pages(file_path: str) -> list[bytes]:
+        pages: list[bytes] = []
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                pix = page.get_pixmap(matrix=_VISION_MATRIX, colorspace=fitz.csGRAY)
+                image = Image.frombuffer("L", (pix.width, pix.height), pix.samples, "raw", "L", 0, 1)
+                image.thumbnail((1024, 1024), Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=80, optimize=True)
+                pages.append(buffer.getvalue())
+        return pages
+
+    async def _extract_pdf_with_ai_vision(self, file_path: str) -> str:
+        pages = await asyncio.to_thread(self._render_vision_pages, file_path)
+        # pages are independent network calls, so fan out and pay ~one RTT for
+        # the whole document; the semaphore keeps us inside the provider's RPM quota
+        gate = asyncio.Semaphore(10)
+
+        async def ocr_page(jpeg: bytes) -> str:
+            async with gate:
+                return await ai_service.ocr_image(jpeg)
+
+        results = await asyncio.gather(*(ocr_page(jpeg) for jpeg in pages), return_exceptions=True)
+        # keep page order, drop pages that failed rather than failing the document
+        page_texts = [text for text in results if isinstance(text, str)]
+        if not any(text.strip() for text in page_texts):
+            for result in results:
+                if isinstance(result, BaseException):
+                    # nothing survived and at least one page errored: surface the
+                    # provider failure (a 502 gets the 60s transient TTL) instead
+                    # of returning "" and caching a bad-document 422 for a day
+                    raise result
+        return "\n".join(page_texts)
+
+    @staticmethod
+    def _extract_txt(file_path: str) -> str:
+        # one read + one detector pass instead of up to four full decode attempts
+        with open(file_path, "rb") as fh:
+            raw = fh.read()
+        if raw.startswith(codecs.BOM_UTF8):
+            return raw[3:].decode("utf-8")
+        if charset_normalizer is not None:
+            best = charset_normalizer.from_bytes(raw).best()
+            if best is not None:
+                return str(best)
+        # fallback ladder when detection is unavailable or comes up empty
+        for encoding in ("utf-8", "utf-16", "latin-1", "cp1252"):
+            try:
+                return raw.decode(encoding)
+            except UnicodeError:
+                continue
+        return raw.decode("utf-8", errors="replace")
+
+    def read_file_as_base64(self, file_path: str) -> str:
+        # base64 is only kept for transports that demand it; encode straight off
+        # the page cache via mmap so the raw bytes are never copied into Python
+        if os.path.getsize(file_path) == 0:
+            return ""
+        with open(file_path, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return base64.b64encode(mm).decode("ascii")
+
+
+file_service = FileProcessingService()
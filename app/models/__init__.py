@@ -1,2 +1,3 @@
 # import all submodules here so when i import from app.models, all table metadata would have loaded into the SQLModel class
-from app.auth import models
\ No newline at end of file
+from app.auth import models
+from app.streaks import models as streak_models
\ No newline at end of file
@@ -0,0 +1,11 @@
+from datetime import date, datetime
+from sqlmodel import Field, SQLModel
+
+
+class ReadingStreak(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", unique=True, index=True)
+    current_streak: int = Field(default=0)
+    longest_streak: int = Field(default=0)
+    last_activity_date: date | None = Field(default=None)
+    updated_at: datetime | None = Field(default=None)
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from app.streaks.models import ReadingStreak
+
+
+class StreakService:
+    def get_or_create_streak(self, session: Session, user_id: int) -> ReadingStreak:
+        streak = session.exec(select(ReadingStreak).where(ReadingStreak.user_id == user_id)).first()
+        if streak is None:
+            streak = ReadingStreak(user_id=user_id)
+            session.add(streak)
+            session.commit()
+            session.refresh(streak)
+        return streak
+
+    def update_streak(self, session: Session, user_id: int) -> ReadingStreak:
+        # read the clock once and reuse it, so a midnight rollover mid-call
+        # can't leave last_activity_date and updated_at on different days
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        # one atomic upsert instead of select + insert/update + refresh; the
+        # streak arithmetic happens in SQL so concurrent pings can't race
+        new_current = case(
+            (ReadingStreak.last_activity_date == today, ReadingStreak.current_streak),
+            (ReadingStreak.last_activity_date == today - timedelta(days=1), ReadingStreak.current_streak + 1),
+            else_=1,
+        )
+        stmt = (
+            insert(ReadingStreak)
+            .values(user_id=user_id, current_streak=1, longest_streak=1, last_activity_date=today, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "current_streak": new_current,
+                    "longest_streak": func.greatest(ReadingStreak.longest_streak, new_current),
+                    "last_activity_date": today,
+                    "updated_at": now,
+                },
+            )
+            .returning(ReadingStreak)
+        )
+        streak = session.scalars(stmt).one()
+        session.commit()
+        return streak
+
+    def check_streak_status(self, session: Session, user_id: int) -> dict:
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        streak = self.get_or_create_streak(session, user_id)
+        still_active = streak.last_activity_date in (today, today - timedelta(days=1))
+        return {
+            "current_streak": streak.current_streak if still_active else 0,
+            "longest_streak": streak.longest_streak,
+            "last_activity_date": streak.last_activity_date,
+            "active_today": streak.last_activity_date == today,
+        }
+
+
+streak_service = StreakService()